@@ -6,9 +6,10 @@
 # or terminates with a best-guess warning.
 # ============================================================
 
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 from agent.graph_state import LeanAgentState
 from agent.nodes import (
+    node_transcript_fetch,
     node_visual_label,
     node_temporal_context,
     node_tool_router,
@@ -27,9 +28,8 @@ def _routing_logic(state: LeanAgentState) -> str:
     - Retry synthesis (validation failed, attempts remaining)
     - Give up with best-guess (max retries exceeded)
     """
-    # Get dynamic thresholds for current content type
-    from agent.validator import get_dynamic_thresholds
-    upper, lower = get_dynamic_thresholds(state.get("visual_classification_label", ""))
+    # Threshold for the current content type, computed by the validator
+    upper = state["validation_upper"]
 
     score = state.get("validation_score", 0.0)
     attempts = state.get("correction_attempts", 0)
@@ -52,15 +52,20 @@ def build_graph() -> StateGraph:
     workflow = StateGraph(LeanAgentState)
 
     # ── Register Nodes ────────────────────────────────────────
+    workflow.add_node("node_transcript_fetch", node_transcript_fetch)
     workflow.add_node("node_visual_label", node_visual_label)
     workflow.add_node("node_temporal_context", node_temporal_context)
     workflow.add_node("node_tool_router", node_tool_router)
     workflow.add_node("node_synthesize", node_synthesize)
     workflow.add_node("node_fusion_validator", node_fusion_validator)
 
-    # ── Wire Linear Edges ─────────────────────────────────────
-    workflow.set_entry_point("node_visual_label")
-    workflow.add_edge("node_visual_label", "node_temporal_context")
+    # ── Fan-out: transcript fetch ∥ visual label ──────────────
+    # Both branches write disjoint state keys, so no reducer is needed.
+    workflow.add_edge(START, "node_transcript_fetch")
+    workflow.add_edge(START, "node_visual_label")
+
+    # ── Fan-in + Linear Edges ─────────────────────────────────
+    workflow.add_edge(["node_transcript_fetch", "node_visual_label"], "node_temporal_context")
     workflow.add_edge("node_temporal_context", "node_tool_router")
     workflow.add_edge("node_tool_router", "node_synthesize")
     workflow.add_edge("node_synthesize", "node_fusion_validator")
@@ -18,6 +18,7 @@ class LeanAgentState(TypedDict):
     # ── Context Derivations (populated by agent nodes) ────────
     has_transcript: bool
     transcript_context: str
+    transcript_relevance: float  # Keyword coverage of the window (0.0–1.0)
     visual_classification_label: str
     tool_data: str  # Appended via Web Search Node
 
@@ -28,5 +29,7 @@ class LeanAgentState(TypedDict):
 
     # ── Orchestrator Mutations & Memory ───────────────────────
     draft_answer: str
+    visual_gist: str  # 3-5 word caption of draft_answer, for SigLIP
     validation_score: float
+    validation_upper: float  # Pass threshold for this content type
     correction_attempts: int
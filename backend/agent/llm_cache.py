@@ -0,0 +1,54 @@
+# ============================================================
+# agent/llm_cache.py — In-Process Cache for Deterministic LLM Calls
+# ============================================================
+# Memoizes deterministic Flash sub-results (e.g. visual labels)
+# so repeated prompts — same snippet, same inputs — never pay for
+# a second Gemini round-trip.
+# ============================================================
+
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+
+
+@dataclass
+class LLMCache:
+    """Thread-safe LRU cache mapping prompt fingerprints to response text."""
+    maxsize: int = 512
+    _store: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    @staticmethod
+    def make_key(model: str, template_id: str, *parts: str | bytes) -> str:
+        """
+        Fingerprint a call by model, prompt template and its variable inputs.
+
+        Args:
+            model: Gemini model name
+            template_id: Stable identifier of the prompt template
+            parts: Whatever varies per call (draft text, image bytes, ...)
+        """
+        h = hashlib.sha256(f"{model}\x1f{template_id}".encode())
+        for part in parts:
+            h.update(b"\x1f")
+            h.update(part if isinstance(part, bytes) else part.encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            value = self._store.get(key)
+            if value is not None:
+                self._store.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._store[key] = value
+            self._store.move_to_end(key)
+            if len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+
+
+# ── Singleton Cache ───────────────────────────────────────────
+llm_cache = LLMCache()
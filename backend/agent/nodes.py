@@ -5,19 +5,76 @@
 # Images are fetched from Redis by reference — never stored in state.
 # ============================================================
 
-import io
+import json
 import asyncio
 from PIL import Image
-
-from config import key_rotator, MODEL_FLASH, MODEL_PRO, MAX_CORRECTION_ATTEMPTS
-from redis_client import get_image
+from google.genai import types
+
+from config import (
+    key_rotator,
+    MODEL_FLASH,
+    MODEL_PRO,
+    MAX_CORRECTION_ATTEMPTS,
+    TRANSCRIPT_TRUSTED_RELEVANCE,
+    TRANSCRIPT_TRUSTED_MIN_CHARS,
+    TRANSCRIPT_SPECULATE_BELOW_RELEVANCE,
+)
+from redis_client import get_image, get_images_pil, decode_image
 from transcript import fetch_transcript, semantic_search_transcript
-from agent.validator import siglip_similarity, get_dynamic_thresholds, llm_judge
+from agent.validator import siglip_similarity, get_dynamic_thresholds, is_abstract_label, llm_judge
+from agent.llm_cache import llm_cache
+
+
+# Synthesis returns {"answer", "visual_gist"} so the validator gets its
+# SigLIP caption without a separate extraction round-trip
+_SYNTH_CONFIG = types.GenerateContentConfig(response_mime_type="application/json")
+
+# SigLIP (224px) and the Flash labeler gain nothing past ~512px, so the
+# snippet JPEG is DCT-downscaled on decode; only the full frame is decoded
+# at native resolution
+_SNIPPET_DRAFT_SIZE = 512
+
+
+# ── Synthesis Prompt Templates ────────────────────────────────
+# Assembled once at import; the correction block only exists in the
+# retry variant, so first attempts never evaluate it.
+_SYNTH_CONTEXT = """You are an expert AI assistant analyzing a YouTube video frame.
+
+USER QUESTION: {query}
 
+VISUAL CONTEXT:
+- Image 1 (FULL FRAME): The complete video frame for macro context
+- Image 2 (CROPPED SNIPPET): The specific area the user highlighted at coordinates [x={x:.0f}, y={y:.0f}, w={w:.0f}, h={h:.0f}]
+- Visual Classification: {visual_label}
 
-def _bytes_to_pil(image_bytes: bytes) -> Image.Image:
-    """Convert raw bytes to PIL Image."""
-    return Image.open(io.BytesIO(image_bytes)).convert("RGB")
+TRANSCRIPT CONTEXT (what the video creator was saying):
+{transcript}
+
+SUPPLEMENTARY DATA:
+{tool_data}
+"""
+
+_SYNTH_CORRECTION = """
+⚠️ CORRECTION ATTEMPT #{attempt}
+Your previous answer was flagged by the validation guardrail as potentially inaccurate.
+Previous validation score: {score:.2f}
+Please RE-EXAMINE the images more carefully and provide a corrected answer.
+Focus specifically on what the CROPPED IMAGE actually shows, not what you assume.
+"""
+
+_SYNTH_INSTRUCTIONS = """
+INSTRUCTIONS:
+1. Focus your answer on what the CROPPED SNIPPET shows
+2. Use the FULL FRAME for surrounding context (what else is on screen)
+3. Use the TRANSCRIPT to understand what the creator was explaining at this moment
+4. Be specific, technical, and accurate
+5. If you're uncertain about any detail, say so explicitly
+6. Keep the answer concise but comprehensive (under 250 words)
+
+Return JSON: {{"answer": "<your answer>", "visual_gist": "<3-5 word literal visual description of the main object your answer describes, e.g. Python code in dark IDE>"}}"""
+
+_SYNTH_FIRST_TMPL = _SYNTH_CONTEXT + _SYNTH_INSTRUCTIONS
+_SYNTH_RETRY_TMPL = _SYNTH_CONTEXT + _SYNTH_CORRECTION + _SYNTH_INSTRUCTIONS
 
 
 def _pil_to_genai_part(image: Image.Image):
@@ -28,26 +85,32 @@ def _pil_to_genai_part(image: Image.Image):
     return image
 
 
-# ── Node 1: Visual Labeling & Fast-Fail ───────────────────────
+# ── Node 1a: Transcript Availability (fan-out branch) ────────
+async def node_transcript_fetch(state: dict) -> dict:
+    """
+    Fast-fail check for transcript availability.
+    Runs in parallel with node_visual_label — the network fetch is
+    offloaded to a worker thread so it overlaps the Gemini call.
+    """
+    has_transcript, _ = await asyncio.to_thread(fetch_transcript, state["video_id"])
+
+    return {"has_transcript": has_transcript}
+
+
+# ── Node 1b: Visual Labeling (fan-out branch) ─────────────────
 async def node_visual_label(state: dict) -> dict:
     """
     Pulls the snippet from Redis and asks Gemini Flash to generate
     a structural label for the cropped image.
-    Also checks transcript availability (fast-fail if unavailable).
     """
     # Fetch snippet image from Redis
     snippet_bytes = await get_image(state["snippet_ref"])
     if not snippet_bytes:
-        return {
-            "visual_classification_label": "unknown visual content",
-            "has_transcript": False,
-        }
+        return {"visual_classification_label": "unknown visual content"}
 
-    snippet_image = _bytes_to_pil(snippet_bytes)
+    snippet_image = decode_image(state["snippet_ref"], snippet_bytes, _SNIPPET_DRAFT_SIZE)
 
     # Ask Gemini Flash for a structural visual label
-    client = key_rotator.get_client()
-
     label_prompt = """Look at this image carefully. Provide a concise structural description of what you see.
 
 Rules:
@@ -56,8 +119,14 @@ Rules:
 3. Do NOT interpret or analyze the content, just classify what it visually IS.
 4. Return ONLY the description, nothing else."""
 
+    # Same pixels → same label; keyed on content so repeat questions hit
+    cache_key = llm_cache.make_key(MODEL_FLASH, "visual_label", snippet_bytes)
+    visual_label = llm_cache.get(cache_key)
+    if visual_label is not None:
+        return {"visual_classification_label": visual_label}
+
     try:
-        response = key_rotator.call_with_retry(
+        response = await key_rotator.acall_with_retry(
             model=MODEL_FLASH,
             contents=[
                 _pil_to_genai_part(snippet_image),
@@ -65,22 +134,18 @@ Rules:
             ],
         )
         visual_label = response.text.strip()
+        llm_cache.set(cache_key, visual_label)
     except Exception as e:
         visual_label = f"visual content (classification failed: {str(e)[:50]})"
 
-    # Fast-fail: Check transcript availability
-    has_transcript, _ = fetch_transcript(state["video_id"])
-
-    return {
-        "visual_classification_label": visual_label,
-        "has_transcript": has_transcript,
-    }
+    return {"visual_classification_label": visual_label}
 
 
 # ── Node 2: Temporal Context & Semantic Transcript Search ─────
 async def node_temporal_context(state: dict) -> dict:
     """
-    Fetches the transcript and applies temporal windowing + semantic search.
+    Fan-in point for Node 1a/1b: needs both the transcript availability
+    flag and the visual label before the semantic search can run.
     Self-contained: fetches transcript directly using video_id from state.
     """
     if not state.get("has_transcript"):
@@ -88,15 +153,15 @@ async def node_temporal_context(state: dict) -> dict:
             "transcript_context": "[No transcript available for this video]",
         }
 
-    # Fetch transcript directly (cached by youtube-transcript-api internally)
-    has_transcript, raw_transcript = fetch_transcript(state["video_id"])
+    # Fetch transcript directly (served from the per-video cache after Node 1a)
+    has_transcript, raw_transcript = await asyncio.to_thread(fetch_transcript, state["video_id"])
 
     if not has_transcript or not raw_transcript:
         return {
             "transcript_context": "[Transcript fetch failed on retry]",
         }
 
-    transcript_text = semantic_search_transcript(
+    transcript_text, relevance = semantic_search_transcript(
         transcript=raw_transcript,
         visual_label=state["visual_classification_label"],
         query=state["query"],
@@ -105,10 +170,45 @@ async def node_temporal_context(state: dict) -> dict:
 
     return {
         "transcript_context": transcript_text or "[No relevant transcript found in temporal window]",
+        "transcript_relevance": relevance,
     }
 
 
 # ── Node 3: External Tool Router (Web Search) ────────────────
+async def _transcript_answers_query(visual_label: str, transcript_ctx: str, query: str) -> bool:
+    """Quick check: ask the LLM if the transcript answers the query."""
+    try:
+        check_response = await key_rotator.acall_with_retry(
+            model=MODEL_FLASH,
+            contents=f"""Given this transcript context and visual description, can you answer the user's question?
+
+Visual: {visual_label}
+Transcript: {transcript_ctx[:500]}
+Question: {query}
+
+Respond ONLY "YES" or "NO".""",
+        )
+        return "NO" not in check_response.text.upper()
+    except Exception:
+        return True
+
+
+async def _supplementary_knowledge(visual_label: str, query: str) -> str:
+    """Use Gemini to provide supplementary knowledge."""
+    try:
+        tool_response = await key_rotator.acall_with_retry(
+            model=MODEL_FLASH,
+            contents=f"""The user is watching a YouTube video and highlighted something that looks like: "{visual_label}".
+Their question is: "{query}"
+
+The video transcript doesn't sufficiently explain this. Please provide a concise, factual explanation that would help answer their question.
+Focus on technical accuracy. Keep it under 200 words.""",
+        )
+        return tool_response.text.strip()
+    except Exception as e:
+        return f"[External search failed: {str(e)[:100]}]"
+
+
 async def node_tool_router(state: dict) -> dict:
     """
     Evaluates if the transcript context is sufficient.
@@ -125,41 +225,30 @@ async def node_tool_router(state: dict) -> dict:
         or "[No transcript" in transcript_ctx
     )
 
-    if not needs_external:
-        # Quick check: ask the LLM if the transcript answers the query
-        client = key_rotator.get_client()
-        try:
-            check_response = key_rotator.call_with_retry(
-                model=MODEL_FLASH,
-                contents=f"""Given this transcript context and visual description, can you answer the user's question?
+    if needs_external:
+        return {"tool_data": await _supplementary_knowledge(visual_label, query)}
 
-Visual: {visual_label}
-Transcript: {transcript_ctx[:500]}
-Question: {query}
+    relevance = state.get("transcript_relevance", 0.0)
 
-Respond ONLY "YES" or "NO".""",
-            )
-            if "NO" in check_response.text.upper():
-                needs_external = True
-        except Exception:
-            pass
+    # Happy path: a long, keyword-dense window answers the query without asking
+    if relevance > TRANSCRIPT_TRUSTED_RELEVANCE and len(transcript_ctx) > TRANSCRIPT_TRUSTED_MIN_CHARS:
+        return {"tool_data": ""}
 
-    if needs_external:
-        # Use Gemini to provide supplementary knowledge
-        try:
-            tool_response = key_rotator.call_with_retry(
-                model=MODEL_FLASH,
-                contents=f"""The user is watching a YouTube video and highlighted something that looks like: "{visual_label}".
-Their question is: "{query}"
+    if relevance >= TRANSCRIPT_SPECULATE_BELOW_RELEVANCE:
+        # Check first — the transcript is likely enough, so a speculative
+        # knowledge call would mostly be thrown away
+        if await _transcript_answers_query(visual_label, transcript_ctx, query):
+            return {"tool_data": ""}
+        return {"tool_data": await _supplementary_knowledge(visual_label, query)}
 
-The video transcript doesn't sufficiently explain this. Please provide a concise, factual explanation that would help answer their question.
-Focus on technical accuracy. Keep it under 200 words.""",
-            )
-            return {"tool_data": tool_response.text.strip()}
-        except Exception as e:
-            return {"tool_data": f"[External search failed: {str(e)[:100]}]"}
+    # Speculative execution: a sparse window will most likely fail the
+    # check, so fetch supplementary knowledge while it runs
+    tool_task = asyncio.create_task(_supplementary_knowledge(visual_label, query))
+    if await _transcript_answers_query(visual_label, transcript_ctx, query):
+        tool_task.cancel()
+        return {"tool_data": ""}
 
-    return {"tool_data": ""}
+    return {"tool_data": await tool_task}
 
 
 # ── Node 4: Multimodal Synthesis ──────────────────────────────
@@ -174,69 +263,51 @@ async def node_synthesize(state: dict) -> dict:
     6. BBox coordinates for spatial awareness
     7. Previous error context (if correction loop)
     """
-    # Fetch both images from Redis (Visual Flow — raw pixels, not text)
-    full_frame_bytes = await get_image(state["full_frame_ref"])
-    snippet_bytes = await get_image(state["snippet_ref"])
+    # Fetch both images from Redis in one round-trip (Visual Flow — raw pixels, not text)
+    full_frame_image, snippet_image = await get_images_pil(
+        [state["full_frame_ref"], state["snippet_ref"]],
+        [None, _SNIPPET_DRAFT_SIZE],
+    )
 
-    if not full_frame_bytes or not snippet_bytes:
+    if full_frame_image is None or snippet_image is None:
         return {"draft_answer": "Failed to retrieve image data from cache."}
 
-    full_frame_image = _bytes_to_pil(full_frame_bytes)
-    snippet_image = _bytes_to_pil(snippet_bytes)
-
-    # Build the synthesis prompt
-    correction_context = ""
-    if state["correction_attempts"] > 0:
-        correction_context = f"""
-⚠️ CORRECTION ATTEMPT #{state['correction_attempts']}
-Your previous answer was flagged by the validation guardrail as potentially inaccurate.
-Previous validation score: {state['validation_score']:.2f}
-Please RE-EXAMINE the images more carefully and provide a corrected answer.
-Focus specifically on what the CROPPED IMAGE actually shows, not what you assume."""
-
-    bbox = state["bbox_coordinates"]
-    synthesis_prompt = f"""You are an expert AI assistant analyzing a YouTube video frame.
-
-USER QUESTION: {state['query']}
-
-VISUAL CONTEXT:
-- Image 1 (FULL FRAME): The complete video frame for macro context
-- Image 2 (CROPPED SNIPPET): The specific area the user highlighted at coordinates [x={bbox[0]:.0f}, y={bbox[1]:.0f}, w={bbox[2]:.0f}, h={bbox[3]:.0f}]
-- Visual Classification: {state['visual_classification_label']}
-
-TRANSCRIPT CONTEXT (what the video creator was saying):
-{state['transcript_context'][:1500]}
-
-SUPPLEMENTARY DATA:
-{state['tool_data'][:500] if state['tool_data'] else 'None needed'}
-
-{correction_context}
-
-INSTRUCTIONS:
-1. Focus your answer on what the CROPPED SNIPPET shows
-2. Use the FULL FRAME for surrounding context (what else is on screen)
-3. Use the TRANSCRIPT to understand what the creator was explaining at this moment
-4. Be specific, technical, and accurate
-5. If you're uncertain about any detail, say so explicitly
-6. Keep the answer concise but comprehensive (under 250 words)"""
-
-    client = key_rotator.get_client()
+    # Build the synthesis prompt from the pre-assembled template
+    template = _SYNTH_RETRY_TMPL if state["correction_attempts"] else _SYNTH_FIRST_TMPL
+    x, y, w, h = state["bbox_coordinates"]
+    synthesis_prompt = template.format(
+        query=state["query"],
+        x=x, y=y, w=w, h=h,
+        visual_label=state["visual_classification_label"],
+        transcript=state["transcript_context"][:1500],
+        tool_data=state["tool_data"][:500] or "None needed",
+        attempt=state["correction_attempts"],
+        score=state["validation_score"],
+    )
 
+    visual_gist = ""
     try:
-        response = key_rotator.call_with_retry(
+        response = await key_rotator.acall_with_retry(
             model=MODEL_PRO,
             contents=[
                 _pil_to_genai_part(full_frame_image),
                 _pil_to_genai_part(snippet_image),
                 synthesis_prompt,
             ],
+            config=_SYNTH_CONFIG,
         )
-        draft = response.text.strip()
+        try:
+            result = json.loads(response.text)
+            draft = str(result.get("answer", "")).strip()
+            visual_gist = str(result.get("visual_gist", "")).strip()
+        except (json.JSONDecodeError, AttributeError):
+            draft = response.text.strip()
     except Exception as e:
         draft = f"Synthesis failed: {str(e)[:200]}"
 
     return {
         "draft_answer": draft,
+        "visual_gist": visual_gist,
         "correction_attempts": state["correction_attempts"] + 1,
     }
 
@@ -249,48 +320,51 @@ async def node_fusion_validator(state: dict) -> dict:
     Tier 2: Dynamic thresholds based on content type
     Tier 3: LLM-Judge for gray zone verification
     """
+    # Tier 2: Dynamic Thresholds (the pass bound also goes to _routing_logic via state)
+    upper, lower = get_dynamic_thresholds(state["visual_classification_label"])
+    pass_threshold = {"validation_upper": upper}
+
     snippet_bytes = await get_image(state["snippet_ref"])
     if not snippet_bytes:
         # Can't validate without image — pass through
-        return {"validation_score": 0.5}
+        return {"validation_score": 0.5, **pass_threshold}
 
-    snippet_image = _bytes_to_pil(snippet_bytes)
+    snippet_image = decode_image(state["snippet_ref"], snippet_bytes, _SNIPPET_DRAFT_SIZE)
 
-    # Extract a short description from the draft answer for SigLIP comparison
-    client = key_rotator.get_client()
-    try:
-        caption_response = key_rotator.call_with_retry(
-            model=MODEL_FLASH,
-            contents=f"""Extract ONLY a 3-5 word literal visual description of the main object from this answer. 
-No analysis, just what it physically looks like.
+    # Speculative Tier 3 only for abstract content, whose wide gray zone
+    # usually ends in the judge anyway; elsewhere the judge starts only
+    # after SigLIP lands in the gray zone, sparing the Flash quota
+    judge_task = None
+    if is_abstract_label(state["visual_classification_label"]):
+        judge_task = asyncio.create_task(llm_judge(snippet_bytes, state["draft_answer"]))
 
-Answer: {state['draft_answer'][:300]}
+    # Short visual description emitted alongside the draft by node_synthesize
+    short_caption = state.get("visual_gist") or state["visual_classification_label"]
 
-Example outputs: "Python code in dark IDE", "star network topology diagram", "red circuit board"
-Respond with ONLY the description:""",
+    # Tier 1: SigLIP Math Check (CPU-bound — keep it off the event loop)
+    try:
+        similarity = await asyncio.to_thread(
+            siglip_similarity, snippet_image, short_caption, cache_key=state["snippet_ref"]
         )
-        short_caption = caption_response.text.strip()
-    except Exception:
-        short_caption = state["visual_classification_label"]
-
-    # Tier 1: SigLIP Math Check
-    similarity = siglip_similarity(snippet_image, short_caption)
-
-    # Tier 2: Dynamic Thresholds
-    upper, lower = get_dynamic_thresholds(state["visual_classification_label"])
-
-    if similarity >= upper:
-        # High confidence — pass
-        return {"validation_score": similarity}
-    elif similarity < lower:
-        # Low confidence — fail (will trigger correction loop)
-        return {"validation_score": similarity}
+    except BaseException:
+        if judge_task:
+            judge_task.cancel()
+        raise
+
+    if similarity >= upper or similarity < lower:
+        # Clear pass, or clear fail (will trigger correction loop)
+        if judge_task:
+            judge_task.cancel()
+        return {"validation_score": similarity, **pass_threshold}
     else:
-        # Gray zone — invoke LLM-Judge
-        judge_agrees = llm_judge(snippet_image, state["draft_answer"])
+        # Gray zone — collect the LLM-Judge verdict
+        if judge_task:
+            judge_agrees = await judge_task
+        else:
+            judge_agrees = await llm_judge(snippet_bytes, state["draft_answer"])
         if judge_agrees:
             # Judge agrees — boost score above threshold
-            return {"validation_score": max(similarity, upper)}
+            return {"validation_score": max(similarity, upper), **pass_threshold}
         else:
             # Judge disagrees — force fail
-            return {"validation_score": lower - 0.01}
+            return {"validation_score": lower - 0.01, **pass_threshold}
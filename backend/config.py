@@ -6,12 +6,17 @@
 # ============================================================
 
 import os
+import time
+import logging
+import asyncio
 import itertools
 from dataclasses import dataclass, field
 from threading import Lock
 from google import genai
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -31,25 +36,29 @@ class KeyRotator:
     """Thread-safe round-robin API key rotator."""
     keys: list[str] = field(default_factory=lambda: GEMINI_API_KEYS)
     _cycle: itertools.cycle = field(init=False, repr=False)
+    _client_cycle: itertools.cycle = field(init=False, repr=False)
     _lock: Lock = field(default_factory=Lock, repr=False)
 
     def __post_init__(self):
         self._cycle = itertools.cycle(self.keys)
+        # One long-lived client per key: no per-call construction, and the
+        # underlying HTTP connections stay warm (keep-alive) across requests
+        self._client_cycle = itertools.cycle([genai.Client(api_key=k) for k in self.keys])
 
     def next_key(self) -> str:
         with self._lock:
             return next(self._cycle)
 
     def get_client(self) -> genai.Client:
-        """Returns a new Gemini client with the next rotated API key."""
-        return genai.Client(api_key=self.next_key())
+        """Returns the pooled Gemini client for the next rotated API key."""
+        with self._lock:
+            return next(self._client_cycle)
 
-    def call_with_retry(self, model: str, contents, max_retries: int = 4):
+    def call_with_retry(self, model: str, contents, config=None, max_retries: int = 4):
         """
         Call Gemini with automatic key rotation on 429 errors.
         Tries each key in the pool before giving up.
         """
-        import time
         last_error = None
         for attempt in range(max_retries):
             client = self.get_client()
@@ -57,19 +66,53 @@ class KeyRotator:
                 response = client.models.generate_content(
                     model=model,
                     contents=contents,
+                    config=config,
                 )
                 return response
             except Exception as e:
                 last_error = e
                 if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
                     wait_time = 2 ** attempt  # 1, 2, 4, 8 seconds
-                    print(f"  ⚠️ 429 rate limit hit, rotating key and waiting {wait_time}s (attempt {attempt+1}/{max_retries})")
+                    logger.warning(
+                        "429 rate limit hit, rotating key and waiting %ss (attempt %d/%d)",
+                        wait_time, attempt + 1, max_retries,
+                    )
                     time.sleep(wait_time)
                     continue
                 else:
                     raise
         raise last_error
 
+    async def acall_with_retry(self, model: str, contents, config=None, max_retries: int = 4):
+        """
+        Async variant of call_with_retry for the LangGraph nodes.
+        Uses the SDK's aio client and backs off with asyncio.sleep, so a
+        rate-limited call never blocks the event loop for other sessions.
+        """
+        last_error = None
+        for attempt in range(max_retries):
+            client = self.get_client()
+            try:
+                response = await client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config,
+                )
+                return response
+            except Exception as e:
+                last_error = e
+                if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
+                    wait_time = 2 ** attempt  # 1, 2, 4, 8 seconds
+                    logger.warning(
+                        "429 rate limit hit, rotating key and waiting %ss (attempt %d/%d)",
+                        wait_time, attempt + 1, max_retries,
+                    )
+                    await asyncio.sleep(wait_time)
+                    continue
+                else:
+                    raise
+        raise last_error
+
 
 # ── Singleton Rotator ─────────────────────────────────────────
 key_rotator = KeyRotator()
@@ -82,10 +125,18 @@ MODEL_FLASH = "gemini-2.5-flash"
 # Node 4 (Heavy Synthesis): deep multimodal reasoning
 MODEL_PRO = "gemini-2.5-flash" 
 
+# ── Logging ───────────────────────────────────────────────────
+# Per-request tracing is logged at DEBUG; set LOG_LEVEL=DEBUG to see it
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
 # ── Redis ─────────────────────────────────────────────────────
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 # ── Backend ───────────────────────────────────────────────────
+# Longest side of images kept in Redis; downstream vision models gain
+# nothing past this, and every byte is re-read by several nodes
+MAX_STORED_IMAGE_SIDE = 1280
+
 CORS_ORIGINS = [
     "https://www.youtube.com",
     "https://youtube.com",
@@ -95,3 +146,13 @@ CORS_ORIGINS = [
 # ── Guardrail Thresholds ──────────────────────────────────────
 MAX_CORRECTION_ATTEMPTS = 3
 TRANSCRIPT_WINDOW_SECONDS = 120  # +/- 60s from timestamp
+
+# ── Tool Router ───────────────────────────────────────────────
+# A long transcript window that covers most label/query keywords is
+# trusted without the Flash "can you answer?" check
+TRANSCRIPT_TRUSTED_RELEVANCE = 0.7
+TRANSCRIPT_TRUSTED_MIN_CHARS = 300
+# Below this relevance the check almost always says NO, so the
+# supplementary-knowledge call is started alongside it; above it the
+# check runs first (free-tier keys are ~15 RPM — don't burn wasted calls)
+TRANSCRIPT_SPECULATE_BELOW_RELEVANCE = 0.3
@@ -2,21 +2,78 @@
 # image_utils.py — Image Processing Utilities
 # ============================================================
 # Handles Base64 decode/encode and bounding box cropping.
+# JPEG decode uses simplejpeg (libjpeg-turbo) when it is installed.
 # ============================================================
 
 import base64
 import io
 from PIL import Image
 
+# Optional libjpeg-turbo fast path for JPEG decode; Pillow handles the rest
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
 
-def decode_b64_to_pil(b64_string: str) -> Image.Image:
-    """Decode a base64 string (with or without data URI prefix) to a PIL Image."""
+_JPEG_MAGIC = b"\xff\xd8\xff"
+
+
+def decode_data_uri(b64_string: str) -> bytes:
+    """Decode a base64 string (with or without data URI prefix) to raw bytes."""
     # Strip data URI prefix if present (e.g., "data:image/webp;base64,...")
     if "," in b64_string:
         b64_string = b64_string.split(",", 1)[1]
 
-    image_bytes = base64.b64decode(b64_string)
-    return Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    return base64.b64decode(b64_string)
+
+
+def decode_b64_to_pil(b64_string: str) -> Image.Image:
+    """Decode a base64 string (with or without data URI prefix) to a PIL Image."""
+    image_bytes = decode_data_uri(b64_string)
+    return bytes_to_pil(image_bytes)
+
+
+def bytes_to_pil(image_bytes: bytes, draft_size: int | None = None) -> Image.Image:
+    """
+    Decode raw image bytes to an RGB PIL Image.
+
+    Args:
+        image_bytes: Encoded image (JPEG, WebP, PNG, ...)
+        draft_size: If set and the image is a JPEG, let libjpeg decode at a
+            reduced DCT scale (1/2, 1/4, 1/8) that still covers a
+            draft_size × draft_size box. Other formats ignore it.
+    """
+    if simplejpeg is not None and image_bytes[:3] == _JPEG_MAGIC:
+        try:
+            # min_width/min_height pick the same DCT scale as Image.draft()
+            pixels = simplejpeg.decode_jpeg(
+                image_bytes,
+                colorspace="RGB",
+                min_width=draft_size or 0,
+                min_height=draft_size or 0,
+            )
+            return Image.fromarray(pixels)
+        except (ValueError, RuntimeError):
+            # CMYK, unusual progressive or truncated JPEGs — Pillow copes
+            pass
+
+    image = Image.open(io.BytesIO(image_bytes))
+    if draft_size:
+        image.draft("RGB", (draft_size, draft_size))
+    return image.convert("RGB")
+
+
+def fit_within(image: Image.Image, max_side: int) -> Image.Image:
+    """
+    Downscale an image (aspect preserved) so neither side exceeds max_side.
+    Returns the original object unchanged if it already fits.
+    """
+    w, h = image.size
+    if max(w, h) <= max_side:
+        return image
+    scale = max_side / max(w, h)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
 
 
 def pil_to_b64(image: Image.Image, format: str = "JPEG", quality: int = 85) -> str:
@@ -33,19 +90,17 @@ def pil_to_bytes(image: Image.Image, format: str = "JPEG", quality: int = 85) ->
     return buffer.getvalue()
 
 
-def crop_image(full_frame_b64: str, bbox: list[float]) -> Image.Image:
+def crop_pil(full_image: Image.Image, bbox: list[float]) -> Image.Image:
     """
-    Crop the bounding box region from a base64-encoded full frame.
+    Crop the bounding box region from an already-decoded full frame.
     
     Args:
-        full_frame_b64: Base64 encoded full frame image
+        full_image: Decoded full frame
         bbox: [x, y, width, height] coordinates relative to the displayed video
         
     Returns:
         Cropped PIL Image of the selected region
     """
-    full_image = decode_b64_to_pil(full_frame_b64)
-    
     x, y, w, h = bbox
     
     # Clamp coordinates to image bounds
@@ -56,6 +111,12 @@ def crop_image(full_frame_b64: str, bbox: list[float]) -> Image.Image:
     h = min(int(h), img_h - y)
     
     # Pillow uses (left, upper, right, lower) for crop box
-    cropped = full_image.crop((x, y, x + w, y + h))
-    
-    return cropped
+    return full_image.crop((x, y, x + w, y + h))
+
+
+def crop_image(full_frame_b64: str, bbox: list[float]) -> Image.Image:
+    """
+    Crop the bounding box region from a base64-encoded full frame.
+    Prefer crop_pil() when the frame is already decoded.
+    """
+    return crop_pil(decode_b64_to_pil(full_frame_b64), bbox)
@@ -5,27 +5,70 @@
 # images to Redis, and streams LangGraph agent thoughts via SSE.
 # ============================================================
 
-import json
 import asyncio
-import traceback
+import logging
 from contextlib import asynccontextmanager
+from typing import Callable
 
-from fastapi import FastAPI, Request
+import orjson
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import ValidationError
 
-from config import CORS_ORIGINS
-from models import QueryPayload, SSEEvent
-from image_utils import crop_image, pil_to_bytes
-from redis_client import store_image, generate_session_id, cleanup_session
+from config import CORS_ORIGINS, LOG_LEVEL, MAX_STORED_IMAGE_SIDE
+from models import QueryMeta, QueryPayload, SSEEvent
+from image_utils import decode_data_uri, bytes_to_pil, crop_pil, fit_within, pil_to_bytes
+from redis_client import (
+    get_redis,
+    close_redis,
+    store_images_batch,
+    generate_session_id,
+    cleanup_session,
+)
+from agent.graph import build_graph
+
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 
 # ── Lifespan (startup/shutdown) ───────────────────────────────
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("🚀 Multimodal Video RAG Backend starting...")
+    logger.info("🚀 Multimodal Video RAG Backend starting...")
+    # Connect (and ping) Redis now so the first request doesn't pay for it
+    await get_redis()
+    # Compile the agent graph once; every request reuses it
+    app.state.graph = build_graph()
     yield
-    print("🛑 Backend shutting down.")
+    await close_redis()
+    logger.info("🛑 Backend shutting down.")
+
+
+# ── orjson Request Parsing ────────────────────────────────────
+class ORJSONRequest(Request):
+    """Request whose JSON body is parsed with orjson instead of stdlib json."""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so
+            # FastAPI still turns malformed bodies into a 422
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    """Route that hands its handler an ORJSONRequest before body validation."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def orjson_route_handler(request: Request):
+            return await handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_route_handler
 
 
 app = FastAPI(
@@ -33,7 +76,10 @@ app = FastAPI(
     description="Agentic backend for the YouTube Chrome Extension",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
+# Must be set before any route is registered
+app.router.route_class = ORJSONRoute
 
 # ── CORS Middleware ────────────────────────────────────────────
 app.add_middleware(
@@ -46,125 +92,165 @@ app.add_middleware(
 
 
 # ── SSE Helper ────────────────────────────────────────────────
-def sse_event(data: dict) -> str:
-    """Format a dict as an SSE data line."""
-    line = f"data: {json.dumps(data)}\n\n"
-    print(f"  [SSE OUT] {json.dumps(data)[:200]}")
-    return line
+def sse_event(data: dict) -> bytes:
+    """Format a dict as a compact, pre-encoded SSE data line."""
+    body = orjson.dumps(data)  # compact UTF-8 bytes, no str round-trip
+    logger.debug("  [SSE OUT] %.200s", body)
+    # Keep the space after "data:" — the extension matches on "data: "
+    return b"data: " + body + b"\n\n"
 
 
-# ── Main Streaming Endpoint ──────────────────────────────────
-@app.post("/rag/stream")
-async def rag_stream(payload: QueryPayload):
-    """
-    Accepts the Chrome Extension payload, stores images in Redis,
-    and returns an SSE stream of agent thoughts + final answer.
+# ── Node → UI Thought Map ─────────────────────────────────────
+NODE_THOUGHTS = {
+    "node_transcript_fetch": "Checking transcript availability...",
+    "node_visual_label": "Categorizing visual context...",
+    "node_temporal_context": "Syncing transcript timelines...",
+    "node_tool_router": "Evaluating external knowledge sources...",
+    "node_synthesize": "Synthesizing answer from all context...",
+    "node_fusion_validator": "Running hallucination guardrail...",
+}
+
+
+# ── Shared Stream Pipeline ────────────────────────────────────
+def _rag_stream_response(
+    meta: QueryMeta,
+    load_frame: Callable[[], tuple[str, bytes]],
+) -> StreamingResponse:
     """
-    print(f"\n{'='*60}")
-    print(f"[REQUEST] POST /rag/stream")
-    print(f"  video_id: {payload.video_id}")
-    print(f"  timestamp: {payload.timestamp}")
-    print(f"  query: {payload.query}")
-    print(f"  bbox: {payload.bbox}")
-    print(f"  frame_b64 length: {len(payload.full_frame_b64)} chars")
-    print(f"{'='*60}")
+    Stores the captured frame + snippet in Redis and returns an SSE
+    stream of agent thoughts + final answer.
 
+    Args:
+        meta: Query metadata (video, timestamp, bbox, question)
+        load_frame: Returns the raw encoded frame bytes; runs off the event loop
+    """
     async def event_generator():
         session_id = generate_session_id()
-        print(f"[SESSION] {session_id}")
+        logger.info("[SESSION] %s for video %s", session_id, meta.video_id)
 
         try:
-            # ── Step 1: Store full frame in Redis ──────────────
-            print("[STEP 1] Storing full frame in Redis...")
+            # ── Steps 1+2: Prepare full frame and snippet ─────
+            logger.debug("[STEP 1+2] Preparing full frame and snippet...")
             yield sse_event({"status": "processing", "thought": "Storing captured frame..."})
+            yield sse_event({"status": "processing", "thought": "Extracting selected region..."})
 
-            from image_utils import decode_b64_to_pil
-            full_frame_pil = decode_b64_to_pil(payload.full_frame_b64)
-            print(f"  Full frame decoded: {full_frame_pil.size}")
-            full_frame_bytes = pil_to_bytes(full_frame_pil)
-            full_frame_ref = await store_image(session_id, "full", full_frame_bytes)
-            print(f"  Stored as: {full_frame_ref} ({len(full_frame_bytes)} bytes)")
+            # The captured frame is stored exactly as uploaded unless it
+            # exceeds MAX_STORED_IMAGE_SIDE; the snippet is cropped from the
+            # native-resolution pixels first, then capped the same way
+            def prep_images() -> tuple[bytes, bytes, float]:
+                full_bytes = load_frame()
+                full_pil = bytes_to_pil(full_bytes)
+                logger.debug("  Full frame decoded: %s", full_pil.size)
+                snippet_pil = fit_within(crop_pil(full_pil, meta.bbox), MAX_STORED_IMAGE_SIDE)
 
-            # ── Step 2: Crop the snippet and store ─────────────
-            print("[STEP 2] Cropping snippet...")
-            yield sse_event({"status": "processing", "thought": "Extracting selected region..."})
-            
-            snippet_pil = crop_image(payload.full_frame_b64, payload.bbox)
-            print(f"  Snippet cropped: {snippet_pil.size}")
-            snippet_bytes = pil_to_bytes(snippet_pil)
-            snippet_ref = await store_image(session_id, "snippet", snippet_bytes)
-            print(f"  Stored as: {snippet_ref} ({len(snippet_bytes)} bytes)")
+                frame_scale = 1.0
+                stored_pil = fit_within(full_pil, MAX_STORED_IMAGE_SIDE)
+                if stored_pil is not full_pil:
+                    frame_scale = stored_pil.width / full_pil.width
+                    full_bytes = pil_to_bytes(stored_pil)
+                return full_bytes, pil_to_bytes(snippet_pil), frame_scale
+
+            full_frame_bytes, snippet_bytes, frame_scale = await asyncio.to_thread(prep_images)
+            logger.debug("  Full frame %d bytes, snippet %d bytes", len(full_frame_bytes), len(snippet_bytes))
+
+            # Frame and snippet go to Redis in one round-trip
+            refs = await store_images_batch(
+                session_id,
+                {
+                    "full": full_frame_bytes,
+                    "snippet": snippet_bytes,
+                },
+            )
+            full_frame_ref, snippet_ref = refs["full"], refs["snippet"]
+            logger.debug("  Stored as: %s, %s", full_frame_ref, snippet_ref)
 
             # ── Step 3: Build lean state and run graph ─────────
-            print("[STEP 3] Building graph...")
+            logger.debug("[STEP 3] Building agent state...")
             yield sse_event({"status": "processing", "thought": "Initializing AI agent..."})
 
-            from agent.graph import build_graph
-            graph = build_graph()
-            print("  Graph compiled successfully")
+            graph = app.state.graph
 
             initial_state = {
                 "session_id": session_id,
-                "video_id": payload.video_id,
-                "timestamp": payload.timestamp,
-                "query": payload.query,
-                "bbox_coordinates": payload.bbox,
+                "video_id": meta.video_id,
+                "timestamp": meta.timestamp,
+                "query": meta.query,
+                # Relative to the stored (possibly downscaled) full frame
+                "bbox_coordinates": [c * frame_scale for c in meta.bbox],
                 "full_frame_ref": full_frame_ref,
                 "snippet_ref": snippet_ref,
                 "has_transcript": False,
                 "transcript_context": "",
+                "transcript_relevance": 0.0,
                 "visual_classification_label": "",
                 "tool_data": "",
                 "draft_answer": "",
+                "visual_gist": "",
                 "validation_score": 0.0,
+                "validation_upper": 0.0,
                 "correction_attempts": 0,
             }
 
             # ── Step 4: Stream agent execution ─────────────────
-            print("[STEP 4] Starting graph execution...")
-            accumulated_state = dict(initial_state)
-            async for event in graph.astream(initial_state, stream_mode="updates"):
-                for node_name, node_output in event.items():
-                    print(f"\n  [NODE] {node_name}")
-                    if isinstance(node_output, dict):
-                        for key, val in node_output.items():
-                            val_str = str(val)[:150]
-                            print(f"    {key}: {val_str}")
-                    
-                    thought_map = {
-                        "node_visual_label": "Categorizing visual context...",
-                        "node_temporal_context": "Syncing transcript timelines...",
-                        "node_tool_router": "Evaluating external knowledge sources...",
-                        "node_synthesize": "Synthesizing answer from all context...",
-                        "node_fusion_validator": "Running hallucination guardrail...",
-                    }
-                    thought = thought_map.get(node_name, f"Processing: {node_name}")
-                    yield sse_event({
-                        "status": "processing",
-                        "node": node_name,
-                        "thought": thought,
-                    })
-
-                    # Accumulate all node outputs into the running state
-                    if isinstance(node_output, dict):
-                        accumulated_state.update(node_output)
+            logger.debug("[STEP 4] Starting graph execution...")
+            # Only the final answer fields are read back — track just those
+            draft_answer = ""
+            validation_score = 0.0
+            correction_attempts = 0
+            # The graph runs in its own task feeding a bounded queue, so a
+            # slow client draining the stream never throttles agent execution
+            queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+
+            async def run_graph():
+                try:
+                    async for update in graph.astream(initial_state, stream_mode="updates"):
+                        await queue.put(update)
+                except Exception as exc:
+                    await queue.put(exc)
+                else:
+                    await queue.put(None)
+
+            graph_task = asyncio.create_task(run_graph())
+            try:
+                while (event := await queue.get()) is not None:
+                    if isinstance(event, Exception):
+                        raise event
+                    for node_name, node_output in event.items():
+                        logger.debug("  [NODE] %s", node_name)
+                        if isinstance(node_output, dict) and logger.isEnabledFor(logging.DEBUG):
+                            for key, val in node_output.items():
+                                logger.debug("    %s: %.150s", key, val)
+
+                        thought = NODE_THOUGHTS.get(node_name, f"Processing: {node_name}")
+                        yield sse_event({
+                            "status": "processing",
+                            "node": node_name,
+                            "thought": thought,
+                        })
+
+                        if isinstance(node_output, dict):
+                            draft_answer = node_output.get("draft_answer", draft_answer)
+                            validation_score = node_output.get("validation_score", validation_score)
+                            correction_attempts = node_output.get("correction_attempts", correction_attempts)
+            finally:
+                graph_task.cancel()
 
             # ── Step 5: Send final result ──────────────────────
-            print(f"\n[STEP 5] Graph complete!")
-            print(f"  draft_answer: {accumulated_state.get('draft_answer', 'MISSING')[:200]}")
-            print(f"  validation_score: {accumulated_state.get('validation_score', 'MISSING')}")
-            print(f"  correction_attempts: {accumulated_state.get('correction_attempts', 'MISSING')}")
-            
-            if accumulated_state.get("draft_answer"):
+            logger.debug(
+                "[STEP 5] Graph complete: draft_answer=%.200r validation_score=%s correction_attempts=%s",
+                draft_answer, validation_score, correction_attempts,
+            )
+
+            if draft_answer:
                 final_event = {
                     "status": "complete",
-                    "answer": accumulated_state["draft_answer"],
-                    "confidence": accumulated_state.get("validation_score", 0.0),
+                    "answer": draft_answer,
+                    "confidence": validation_score,
                 }
-                print(f"\n[FINAL SSE] Sending 'complete' event with answer ({len(accumulated_state['draft_answer'])} chars)")
+                logger.debug("[FINAL SSE] Sending 'complete' event with answer (%d chars)", len(draft_answer))
                 yield sse_event(final_event)
             else:
-                print("[FINAL SSE] No draft_answer found — sending fallback")
+                logger.info("[FINAL SSE] No draft_answer for session %s — sending fallback", session_id)
                 yield sse_event({
                     "status": "complete",
                     "answer": "I was unable to determine a confident answer for this visual context.",
@@ -172,8 +258,7 @@ async def rag_stream(payload: QueryPayload):
                 })
 
         except Exception as e:
-            print(f"\n[ERROR] {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("[ERROR] Session %s failed: %s", session_id, e)
             yield sse_event({
                 "status": "error",
                 "message": f"Agent error: {str(e)}",
@@ -181,9 +266,8 @@ async def rag_stream(payload: QueryPayload):
         finally:
             # Cleanup Redis blobs
             await cleanup_session(session_id)
-            print(f"[CLEANUP] Session {session_id} cleaned up")
-            print("[DONE] Sending [DONE] sentinel")
-            yield "data: [DONE]\n\n"
+            logger.debug("[CLEANUP] Session %s cleaned up; sending [DONE] sentinel", session_id)
+            yield b"data: [DONE]\n\n"
 
     return StreamingResponse(
         event_generator(),
@@ -196,6 +280,44 @@ async def rag_stream(payload: QueryPayload):
     )
 
 
+# ── Main Streaming Endpoint ──────────────────────────────────
+@app.post("/rag/stream")
+async def rag_stream(payload: QueryPayload):
+    """
+    Accepts the Chrome Extension JSON payload (base64 data-URI frame)
+    and returns the SSE stream.
+    """
+    logger.debug(
+        "[REQUEST] POST /rag/stream video_id=%s timestamp=%s query=%r bbox=%s frame_b64=%d chars",
+        payload.video_id, payload.timestamp, payload.query, payload.bbox, len(payload.full_frame_b64),
+    )
+    return _rag_stream_response(payload, lambda: decode_data_uri(payload.full_frame_b64))
+
+
+# ── Multipart Streaming Endpoint ─────────────────────────────
+@app.post("/rag/stream2")
+async def rag_stream_multipart(
+    full_frame: UploadFile = File(..., description="Raw encoded screenshot of the full viewport"),
+    meta: str = Form(..., description="QueryMeta as a JSON string"),
+):
+    """
+    Same pipeline as /rag/stream, but the frame arrives as a raw file part
+    next to JSON metadata — ~25% less upload and no base64 decode.
+    """
+    try:
+        query_meta = QueryMeta.model_validate_json(meta)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+    full_bytes = await full_frame.read()
+    logger.debug(
+        "[REQUEST] POST /rag/stream2 video_id=%s timestamp=%s query=%r bbox=%s frame=%d bytes (%s)",
+        query_meta.video_id, query_meta.timestamp, query_meta.query, query_meta.bbox, len(full_bytes),
+        full_frame.content_type,
+    )
+    return _rag_stream_response(query_meta, lambda: full_bytes)
+
+
 # ── Health Check ──────────────────────────────────────────────
 @app.get("/health")
 async def health():
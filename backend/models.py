@@ -5,12 +5,16 @@
 from pydantic import BaseModel, Field
 
 
-class QueryPayload(BaseModel):
-    """Incoming payload from the Chrome Extension frontend."""
+class QueryMeta(BaseModel):
+    """Query metadata from the Chrome Extension (everything but the frame)."""
     video_id: str = Field(..., description="YouTube video ID (e.g., 'dQw4w9WgXcQ')")
     timestamp: float = Field(..., description="Video timestamp in seconds when user drew the bounding box")
     bbox: list[float] = Field(..., description="Bounding box coordinates [x, y, width, height] relative to the video element")
     query: str = Field(..., description="User's question about the selected area")
+
+
+class QueryPayload(QueryMeta):
+    """Incoming JSON payload from the Chrome Extension frontend."""
     full_frame_b64: str = Field(..., description="Base64-encoded WebP screenshot of the full viewport")
 
 
@@ -2,70 +2,187 @@
 # redis_client.py — Async Redis Singleton for Image Storage
 # ============================================================
 # Implements the "Lean State" pattern: large image blobs go to
-# Redis, and only lightweight UUID pointers enter LangGraph state.
+# Redis, and only lightweight key pointers enter LangGraph state.
 # ============================================================
 
-import uuid
+import asyncio
+import secrets
+from collections import OrderedDict
+
 import redis.asyncio as aioredis
+from PIL import Image
 from config import REDIS_URL
+from image_utils import bytes_to_pil
 
 # ── Singleton Connection Pool ─────────────────────────────────
 _redis_pool: aioredis.Redis | None = None
+_redis_init_lock = asyncio.Lock()
+
+# ── Decoded Image Cache ───────────────────────────────────────
+# Labeler, synthesizer and validator all read the same snippet; decode
+# each ref once and share the PIL image until the session is cleaned up.
+# Keyed by (ref_key, draft_size): a draft decode is a different image.
+_DECODED_CACHE_SIZE = 64
+_decoded_cache: OrderedDict[tuple[str, int | None], Image.Image] = OrderedDict()
 
 
 async def get_redis() -> aioredis.Redis:
     """Get or create the async Redis connection. Falls back to fakeredis if no server is running."""
     global _redis_pool
-    if _redis_pool is None:
-        try:
-            # Try connecting to real Redis
-            _redis_pool = aioredis.from_url(
-                REDIS_URL,
-                decode_responses=False,
-                max_connections=20,
-            )
-            await _redis_pool.ping()
-            print("✅ Connected to Redis server")
-        except Exception:
-            # Fallback to in-memory fakeredis (no Docker needed for dev)
-            import fakeredis.aioredis
-            _redis_pool = fakeredis.aioredis.FakeRedis(decode_responses=False)
-            print("⚠️  No Redis server found — using in-memory fakeredis (dev mode)")
+    if _redis_pool is not None:
+        return _redis_pool
+
+    # Concurrent first callers must not each dial (and ping) their own pool
+    async with _redis_init_lock:
+        if _redis_pool is None:
+            try:
+                # Try connecting to real Redis
+                pool = aioredis.from_url(
+                    REDIS_URL,
+                    decode_responses=False,
+                    max_connections=20,
+                )
+                await pool.ping()
+                print("✅ Connected to Redis server")
+            except Exception:
+                # Fallback to in-memory fakeredis (no Docker needed for dev)
+                import fakeredis.aioredis
+                pool = fakeredis.aioredis.FakeRedis(decode_responses=False)
+                print("⚠️  No Redis server found — using in-memory fakeredis (dev mode)")
+            _redis_pool = pool
     return _redis_pool
 
 
+async def close_redis():
+    """Close the shared Redis connection (called on app shutdown)."""
+    global _redis_pool
+    if _redis_pool is not None:
+        await _redis_pool.aclose()
+        _redis_pool = None
+
+
+def _session_key(session_id: str) -> str:
+    """Redis key of a session's blob HASH, namespaced apart from other users of the DB."""
+    return f"session:{session_id}"
+
+
+def _split_ref(ref_key: str) -> tuple[str, str]:
+    """Split a reference key ("<session_id>_<field>") into its hash key and field."""
+    session_id, field = ref_key.split("_", 1)
+    return _session_key(session_id), field
+
+
 async def store_image(session_id: str, suffix: str, image_bytes: bytes, ttl: int = 600) -> str:
     """
     Store an image blob in Redis and return the reference key.
     
     Args:
         session_id: Unique session identifier
-        suffix: Key suffix (e.g., 'full' or 'snippet')
+        suffix: Hash field (e.g., 'full' or 'snippet')
         image_bytes: Raw image bytes to store
         ttl: Time-to-live in seconds (default 10 minutes)
     
     Returns:
-        The Redis key string (e.g., "abc123_full")
+        The reference key string (e.g., "abc123_full")
+    """
+    refs = await store_images_batch(session_id, {suffix: image_bytes}, ttl)
+    return refs[suffix]
+
+
+async def store_images_batch(session_id: str, blobs: dict[str, bytes], ttl: int = 600) -> dict[str, str]:
+    """
+    Store several image blobs for a session in a single round-trip.
+
+    All blobs live as fields of one Redis HASH at "session:<session_id>",
+    so a session costs one HSET + EXPIRE to write and one DEL to clean up.
+
+    Args:
+        session_id: Unique session identifier
+        blobs: Mapping of hash field (e.g., 'full', 'snippet') to raw bytes
+        ttl: Time-to-live in seconds (default 10 minutes)
+
+    Returns:
+        Mapping of field to reference key string
     """
     r = await get_redis()
-    ref_key = f"{session_id}_{suffix}"
-    await r.set(ref_key, image_bytes, ex=ttl)
-    return ref_key
+    key = _session_key(session_id)
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.hset(key, mapping=blobs)
+        pipe.expire(key, ttl)
+        await pipe.execute()
+    return {field: f"{session_id}_{field}" for field in blobs}
 
 
 async def get_image(ref_key: str) -> bytes | None:
     """Retrieve an image blob from Redis by its reference key."""
     r = await get_redis()
-    return await r.get(ref_key)
+    return await r.hget(*_split_ref(ref_key))
+
+
+async def get_images(ref_keys: list[str]) -> list[bytes | None]:
+    """
+    Retrieve several image blobs in a single round-trip.
+
+    Uses a non-transactional pipeline so N HGETs cost one RTT instead of N.
+    Results are returned in the same order as ``ref_keys``.
+    """
+    r = await get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        for ref_key in ref_keys:
+            pipe.hget(*_split_ref(ref_key))
+        return await pipe.execute()
+
+
+def decode_image(ref_key: str, image_bytes: bytes, draft_size: int | None = None) -> Image.Image:
+    """Decode image bytes to an RGB PIL Image, reusing a prior decode of the same ref and draft_size."""
+    cache_key = (ref_key, draft_size)
+    image = _decoded_cache.get(cache_key)
+    if image is None:
+        image = bytes_to_pil(image_bytes, draft_size)
+        _decoded_cache[cache_key] = image
+        if len(_decoded_cache) > _DECODED_CACHE_SIZE:
+            _decoded_cache.popitem(last=False)
+    return image
+
+
+async def get_images_pil(
+    ref_keys: list[str],
+    draft_sizes: list[int | None] | None = None,
+) -> list[Image.Image | None]:
+    """
+    Retrieve decoded images by reference key.
+
+    Refs already decoded at the requested draft size are served from memory; the rest
+    are fetched in one pipelined round-trip and decoded once.
+
+    Args:
+        ref_keys: Redis reference keys
+        draft_sizes: Optional per-ref JPEG draft size (see bytes_to_pil)
+    """
+    draft_sizes = draft_sizes or [None] * len(ref_keys)
+    images = [_decoded_cache.get(key) for key in zip(ref_keys, draft_sizes)]
+    missing = [ref_key for ref_key, image in zip(ref_keys, images) if image is None]
+    if not missing:
+        return images
+
+    fetched = dict(zip(missing, await get_images(missing)))
+    return [
+        image if image is not None
+        else decode_image(ref_key, fetched[ref_key], draft_size) if fetched[ref_key]
+        else None
+        for ref_key, image, draft_size in zip(ref_keys, images, draft_sizes)
+    ]
 
 
 async def cleanup_session(session_id: str):
     """Remove all image blobs for a session."""
     r = await get_redis()
-    for suffix in ["full", "snippet"]:
-        await r.delete(f"{session_id}_{suffix}")
+    await r.delete(_session_key(session_id))
+    prefix = f"{session_id}_"
+    for cache_key in [k for k in _decoded_cache if k[0].startswith(prefix)]:
+        del _decoded_cache[cache_key]
 
 
 def generate_session_id() -> str:
     """Generate a unique session ID."""
-    return uuid.uuid4().hex[:12]
+    return secrets.token_hex(6)  # 12 hex chars straight from os.urandom
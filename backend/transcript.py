@@ -6,6 +6,12 @@
 # windowing and basic semantic search within the transcript.
 # ============================================================
 
+import re
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from cachetools import TTLCache
 from youtube_transcript_api import YouTubeTranscriptApi
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from config import TRANSCRIPT_WINDOW_SECONDS
@@ -26,6 +32,14 @@ def _fetch_raw_transcript(video_id: str) -> list[dict]:
     return transcript
 
 
+# ── Transcript Cache ──────────────────────────────────────────
+# Successful fetches are kept per video for an hour, so repeat questions
+# (and the second fetch within one request) skip YouTube — and the
+# tenacity backoff — entirely. Failures are not cached.
+_transcript_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+_transcript_cache_lock = Lock()  # fetches run in worker threads
+
+
 def fetch_transcript(video_id: str) -> tuple[bool, list[dict]]:
     """
     Safely fetch a YouTube video's transcript.
@@ -34,12 +48,42 @@ def fetch_transcript(video_id: str) -> tuple[bool, list[dict]]:
         (success: bool, transcript: list[dict])
         Each transcript entry: {"text": str, "start": float, "duration": float}
     """
+    with _transcript_cache_lock:
+        cached = _transcript_cache.get(video_id)
+    if cached is not None:
+        return True, cached
+
     try:
         transcript = _fetch_raw_transcript(video_id)
-        return True, transcript
     except Exception:
         return False, []
 
+    with _transcript_cache_lock:
+        _transcript_cache[video_id] = transcript
+    return True, transcript
+
+
+# ── Start-Time Index ──────────────────────────────────────────
+# Transcript entries are sorted by start time, so windowing is two
+# binary searches over a cached list of starts. Each entry keeps the
+# transcript itself alive, so a recycled id() can never alias a new list.
+_STARTS_CACHE_SIZE = 64
+_starts_cache: OrderedDict[int, tuple[list[dict], list[float]]] = OrderedDict()
+
+
+def _start_times(transcript: list[dict]) -> list[float]:
+    """Return the (cached) list of entry start times for a transcript."""
+    cached = _starts_cache.get(id(transcript))
+    if cached is not None and cached[0] is transcript and len(cached[1]) == len(transcript):
+        _starts_cache.move_to_end(id(transcript))
+        return cached[1]
+
+    starts = [entry["start"] for entry in transcript]
+    _starts_cache[id(transcript)] = (transcript, starts)
+    if len(_starts_cache) > _STARTS_CACHE_SIZE:
+        _starts_cache.popitem(last=False)
+    return starts
+
 
 def get_temporal_window(
     transcript: list[dict],
@@ -61,10 +105,37 @@ def get_temporal_window(
     start_bound = max(0, timestamp - half_window)
     end_bound = timestamp + half_window
 
-    return [
-        entry for entry in transcript
-        if start_bound <= entry["start"] <= end_bound
-    ]
+    starts = _start_times(transcript)
+    lo = bisect_left(starts, start_bound)
+    hi = bisect_right(starts, end_bound)
+    return transcript[lo:hi]
+
+
+@lru_cache(maxsize=256)
+def _kw_regex(visual_label: str, query: str) -> tuple[re.Pattern | None, int]:
+    """
+    Build the keyword set from visual label + query and compile it into one
+    whole-word alternation.
+
+    Returns:
+        (pattern, keyword_count) — pattern is None when there are no keywords
+    """
+    keywords = set()
+    for text in [visual_label.lower(), query.lower()]:
+        # Simple tokenization — split on spaces and remove short words
+        words = [w.strip(".,!?;:'\"()[]{}") for w in text.split()]
+        keywords.update(w for w in words if len(w) > 2)
+
+    if not keywords:
+        return None, 0
+
+    # One alternation scans each entry once instead of one pass per keyword.
+    # Lookarounds (not \b) so keywords like "c++" still match as whole words.
+    pattern = re.compile(
+        r"(?<!\w)(?:" + "|".join(map(re.escape, sorted(keywords, key=len, reverse=True))) + r")(?!\w)",
+        re.IGNORECASE,
+    )
+    return pattern, len(keywords)
 
 
 def semantic_search_transcript(
@@ -73,7 +144,7 @@ def semantic_search_transcript(
     query: str,
     timestamp: float,
     window_seconds: int = TRANSCRIPT_WINDOW_SECONDS,
-) -> str:
+) -> tuple[str, float]:
     """
     Apply temporal windowing + keyword-based relevance filtering.
     
@@ -88,27 +159,25 @@ def semantic_search_transcript(
         window_seconds: Temporal window size
     
     Returns:
-        Concatenated relevant transcript text
+        (text, relevance) — concatenated relevant transcript text, and the
+        fraction of label/query keywords found anywhere in the window (0.0–1.0)
     """
     # Step 1: Temporal windowing
     window = get_temporal_window(transcript, timestamp, window_seconds)
 
     if not window:
-        return ""
+        return "", 0.0
 
-    # Step 2: Build keyword set from visual label + query
-    keywords = set()
-    for text in [visual_label.lower(), query.lower()]:
-        # Simple tokenization — split on spaces and remove short words
-        words = [w.strip(".,!?;:'\"()[]{}") for w in text.split()]
-        keywords.update(w for w in words if len(w) > 2)
+    # Step 2+3: Keyword pattern for this label/query pair (cached across
+    # correction loops and repeat questions)
+    pattern, keyword_count = _kw_regex(visual_label, query)
 
-    # Step 3: Score each transcript entry by keyword overlap
     scored_entries = []
+    matched_keywords = set()
     for entry in window:
-        entry_text_lower = entry["text"].lower()
-        score = sum(1 for kw in keywords if kw in entry_text_lower)
-        scored_entries.append((score, entry))
+        hits = {m.lower() for m in pattern.findall(entry["text"])} if pattern else set()
+        matched_keywords |= hits
+        scored_entries.append((len(hits), entry))
 
     # Step 4: Sort by relevance (score desc), then by timestamp (asc)
     scored_entries.sort(key=lambda x: (-x[0], x[1]["start"]))
@@ -117,4 +186,6 @@ def semantic_search_transcript(
     # Always return the full window but reordered by relevance
     result_texts = [entry["text"] for _, entry in scored_entries]
 
-    return " ".join(result_texts)
+    relevance = len(matched_keywords) / keyword_count if keyword_count else 0.0
+
+    return " ".join(result_texts), relevance
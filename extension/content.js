@@ -405,7 +405,7 @@
             showStatus("Compressing frame...", "processing");
 
             // Step 4: Compress the capture via OffscreenCanvas
-            const compressedB64 = await compressCapture(captureResponse.dataUrl);
+            const frameBlob = await compressCapture(captureResponse.dataUrl);
 
             // Step 5: Calculate BBox coordinates relative to the video element
             const playerRect = playerContainer.getBoundingClientRect();
@@ -433,8 +433,7 @@
                 timestamp: timestamp,
                 bbox: bbox,
                 query: queryText,
-                full_frame_b64: compressedB64,
-            });
+            }, frameBlob);
         } catch (err) {
             showStatus(`Error: ${err.message}`, "error");
         }
@@ -469,15 +468,19 @@
 
                 ctx.drawImage(img, 0, 0, targetWidth, targetHeight);
 
-                // Encode as WebP with quality threshold
+                // Encode as a raw WebP Blob with quality threshold —
+                // uploaded as-is, no base64 inflation
                 if (canvas.convertToBlob) {
                     canvas
                         .convertToBlob({ type: "image/webp", quality: WEBP_QUALITY })
-                        .then((blob) => blobToBase64(blob))
                         .then(resolve)
                         .catch(reject);
                 } else {
-                    resolve(canvas.toDataURL("image/webp", WEBP_QUALITY));
+                    canvas.toBlob(
+                        (blob) => (blob ? resolve(blob) : reject(new Error("Failed to encode frame"))),
+                        "image/webp",
+                        WEBP_QUALITY
+                    );
                 }
             };
             img.onerror = () => reject(new Error("Failed to load captured image"));
@@ -485,17 +488,8 @@
         });
     }
 
-    function blobToBase64(blob) {
-        return new Promise((resolve, reject) => {
-            const reader = new FileReader();
-            reader.onloadend = () => resolve(reader.result);
-            reader.onerror = reject;
-            reader.readAsDataURL(blob);
-        });
-    }
-
     // ── Backend Communication (SSE) ────────────────────────────
-    async function sendToBackend(payload) {
+    async function sendToBackend(meta, frameBlob) {
         // Close any previous SSE connections
         if (eventSource) {
             eventSource.close();
@@ -503,18 +497,23 @@
         }
 
         console.log("[MRAG] Sending payload to backend:", {
-            video_id: payload.video_id,
-            timestamp: payload.timestamp,
-            query: payload.query,
-            bbox: payload.bbox,
-            frame_length: payload.full_frame_b64?.length,
+            video_id: meta.video_id,
+            timestamp: meta.timestamp,
+            query: meta.query,
+            bbox: meta.bbox,
+            frame_bytes: frameBlob.size,
         });
 
+        // Multipart upload: raw frame bytes + JSON metadata. The browser
+        // sets the multipart Content-Type (with boundary) itself.
+        const form = new FormData();
+        form.append("full_frame", frameBlob, "frame.webp");
+        form.append("meta", JSON.stringify(meta));
+
         try {
-            const response = await fetch(`${BACKEND_URL}/rag/stream`, {
+            const response = await fetch(`${BACKEND_URL}/rag/stream2`, {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify(payload),
+                body: form,
             });
 
             console.log("[MRAG] Fetch response:", response.status, response.statusText);